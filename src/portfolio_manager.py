@@ -21,7 +21,16 @@ class PortfolioManager:
         # Download and process data
         self.price_data = self._download_data()
         self.returns_data = self._calculate_returns()
+        
+        # Contiguous float64 view of the returns for the numeric hot paths
+        self._returns_np = np.ascontiguousarray(self.returns_data.values, dtype=np.float64)
+        self._cols = tuple(self.returns_data.columns)
+        
         self.weights = self._calculate_weights()
+        self._portfolio_returns = self._calculate_portfolio_returns()
+        
+        # Bumped whenever weights change so cached derived results can be invalidated
+        self.version = 0
         
     def _download_data(self) -> pd.DataFrame:
         """Download price data with error handling"""
@@ -43,7 +52,12 @@ class PortfolioManager:
     
     def _calculate_returns(self) -> pd.DataFrame:
         """Calculate log returns"""
-        returns = np.log(self.price_data / self.price_data.shift(1))
+        log_prices = np.log(self.price_data.values)
+        returns = pd.DataFrame(
+            log_prices[1:] - log_prices[:-1],
+            index=self.price_data.index[1:],
+            columns=self.price_data.columns
+        )
         return returns.dropna()
     
     def _calculate_weights(self, method: str = "equal") -> np.array:
@@ -62,21 +76,27 @@ class PortfolioManager:
         
         elif method == "risk_parity":
             # Simplified risk parity
-            returns = self.returns_data
-            inv_vol = 1 / returns.std()
-            weights = inv_vol / inv_vol.sum()
-            return weights.values
+            inv_vol = 1 / self._returns_np.std(axis=0, ddof=1)
+            return inv_vol / inv_vol.sum()
         
         else:
             return np.array([1/n_assets] * n_assets)
     
+    def _calculate_portfolio_returns(self) -> pd.Series:
+        """Calculate weighted portfolio returns"""
+        return pd.Series(self._returns_np @ self.weights, index=self.returns_data.index)
+    
     def get_returns(self) -> pd.DataFrame:
         """Get individual asset returns"""
         return self.returns_data
     
+    def get_returns_array(self) -> np.ndarray:
+        """Get individual asset returns as a contiguous float64 array"""
+        return self._returns_np
+    
     def get_portfolio_returns(self) -> pd.Series:
-        """Calculate weighted portfolio returns"""
-        return (self.returns_data * self.weights).sum(axis=1)
+        """Get cached weighted portfolio returns"""
+        return self._portfolio_returns
     
     def get_weights(self) -> np.array:
         """Get portfolio weights"""
@@ -84,22 +104,54 @@ class PortfolioManager:
     
     def get_correlation_matrix(self) -> pd.DataFrame:
         """Calculate correlation matrix"""
-        return self.returns_data.corr()
+        return pd.DataFrame(
+            np.corrcoef(self._returns_np, rowvar=False),
+            index=self._cols,
+            columns=self._cols
+        )
     
     def rebalance_portfolio(self, method: str = "equal"):
         """Rebalance portfolio with new weights"""
         self.weights = self._calculate_weights(method)
+        self._portfolio_returns = self._calculate_portfolio_returns()
+        self.version += 1
     
     def get_performance_metrics(self) -> Dict:
         """Calculate portfolio performance metrics"""
-        portfolio_returns = self.get_portfolio_returns()
+        x = self.get_portfolio_returns().values
+        n = x.size
+        
+        # Central moments from one deviation array instead of separate pandas reductions
+        mean = x.sum() / n
+        dev = x - mean
+        dev2 = dev * dev
+        m2 = dev2.sum() / n
+        m3 = (dev2 * dev).sum() / n
+        m4 = (dev2 * dev2).sum() / n
+        
+        # Bias-corrected estimators, matching pandas std/skew/kurtosis: NaN when there
+        # are too few observations, 0 for (numerically) constant returns
+        constant = dev2.sum() < 1e-14
+        std = np.sqrt(m2 * n / (n - 1)) if n > 1 else np.nan
+        if n < 3:
+            skewness = np.nan
+        elif constant:
+            skewness = 0.0
+        else:
+            skewness = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5
+        if n < 4:
+            kurtosis = np.nan
+        elif constant:
+            kurtosis = 0.0
+        else:
+            kurtosis = (n - 1) / ((n - 2) * (n - 3)) * ((n + 1) * (m4 / m2 ** 2 - 3) + 6)
         
         metrics = {
-            'total_return': (1 + portfolio_returns).prod() - 1,
-            'annualized_return': portfolio_returns.mean() * 252,
-            'annualized_volatility': portfolio_returns.std() * np.sqrt(252),
-            'skewness': portfolio_returns.skew(),
-            'kurtosis': portfolio_returns.kurtosis()
+            'total_return': np.prod(1 + x) - 1,
+            'annualized_return': mean * 252,
+            'annualized_volatility': std * np.sqrt(252),
+            'skewness': skewness,
+            'kurtosis': kurtosis
         }
         
         return metrics
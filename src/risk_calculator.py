@@ -2,52 +2,150 @@
 Risk Calculator - Core computation engine for VaR calculations
 """
 
+import threading
+import weakref
 import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from scipy import stats
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _ewma_cov_nb(R, cov, lam):
+        """In-place EWMA covariance update over the rows of R (row 0 is skipped)"""
+        d = R.shape[1]
+        for t in range(1, R.shape[0]):
+            for i in range(d):
+                for j in range(d):
+                    cov[i, j] = lam * cov[i, j] + (1 - lam) * R[t, i] * R[t, j]
+        return cov
+    
+    @njit(cache=True)
+    def _student_t_sample(df):
+        """Draw one standard Student-t variate with Bailey's polar method"""
+        while True:
+            u = 2.0 * np.random.random() - 1.0
+            v = 2.0 * np.random.random() - 1.0
+            w = u * u + v * v
+            if 0.0 < w <= 1.0:
+                return u * np.sqrt(df * (w ** (-2.0 / df) - 1.0) / w)
+    
+    @njit(cache=True, parallel=True)
+    def _mc_pnl_nb(df, loc, scale, sims, T, value, seeds):
+        """Simulated P&L per scenario; each chunk of scenarios is seeded independently"""
+        pnl = np.empty(sims)
+        n_chunks = seeds.shape[0]
+        chunk_size = (sims + n_chunks - 1) // n_chunks
+        for c in prange(n_chunks):
+            np.random.seed(seeds[c])
+            for s in range(c * chunk_size, min(sims, (c + 1) * chunk_size)):
+                total = 0.0
+                for t in range(T):
+                    total += loc + scale * _student_t_sample(df)
+                pnl[s] = total * value
+        return pnl
+
+# Scenario draws (simulations * time_horizon) above which the Numba Monte Carlo kernel is used
+NUMBA_MC_MIN_DRAWS = 1_000_000
+# Scenarios per independently seeded chunk; fixed so results do not depend on the
+# thread count, and small so the default 10000 simulations spread over all cores
+NUMBA_MC_CHUNK_SIZE = 256
+
+# Numba's default workqueue threading layer aborts on concurrent parallel launches,
+# and this kernel is reached from worker and Streamlit session threads
+_NUMBA_PARALLEL_LOCK = threading.Lock()
+
+SQRT_252 = np.sqrt(252)
+
+
 class RiskCalculator:
     """Advanced risk calculation engine with multiple VaR methodologies"""
     
-    def __init__(self, portfolio, confidence_level: float, time_horizon: int, simulations: int = 10000):
+    def __init__(self, portfolio, confidence_level: float, time_horizon: int, simulations: int = 10000,
+                 seed: Optional[int] = None):
         self.portfolio = portfolio
         self.confidence_level = confidence_level
         self.time_horizon = time_horizon
         self.simulations = simulations
         self.alpha = 1 - confidence_level
         
-    def calculate_all_var_methods(self) -> Dict:
+        # Constants fixed at construction
+        self._z = float(stats.norm.ppf(self.alpha))
+        self._sqrt_horizon = np.sqrt(self.time_horizon)
+        
+        self.rng = np.random.default_rng(seed)
+        
+        # Running EWMA covariance, advanced by update_ewma. 'source' (a weak reference),
+        # 'columns', 'n_obs' and 'end' identify the returns frame it covers, so parametric
+        # VaR only reuses it for that exact frame
+        self._ewma_state = {'cov': None, 'lambda': 0.94, 'source': None, 'columns': None,
+                            'n_obs': 0, 'end': None}
+        self._ewma_lock = threading.Lock()
+        
+    def calculate_all_var_methods(self, bootstrap: bool = False) -> Dict:
         """Calculate VaR using all three methods and additional risk metrics"""
         
         returns = self.portfolio.get_returns()
         portfolio_returns = self.portfolio.get_portfolio_returns()
         
-        results = {
-            'historical': self._calculate_historical_var(portfolio_returns),
-            'parametric': self._calculate_parametric_var(returns),
-            'monte_carlo': self._calculate_monte_carlo_var(returns),
-            'volatility': self._calculate_volatility(portfolio_returns),
-            'sharpe_ratio': self._calculate_sharpe_ratio(portfolio_returns),
-            'max_drawdown': self._calculate_max_drawdown(portfolio_returns),
-            'var_breakdown': self._calculate_component_var(returns)
-        }
+        # Independent child generators keep seeded runs reproducible across threads;
+        # historical VaR only samples when bootstrap resampling is requested
+        monte_carlo_rng = np.random.default_rng(self.rng.integers(0, 2**63))
+        historical_rng = np.random.default_rng(self.rng.integers(0, 2**63)) if bootstrap else None
+        
+        # Only the sampling methods are heavy enough for a worker thread; they spend their
+        # time in NumPy/SciPy code that releases the GIL, the rest runs inline meanwhile.
+        # The parallel Numba kernel stays on the calling thread: under the TBB threading
+        # layer, a launch from a worker thread hangs the interpreter at exit.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            monte_carlo = None
+            if not self._uses_numba_monte_carlo():
+                monte_carlo = executor.submit(self._calculate_monte_carlo_var, returns, monte_carlo_rng)
+            historical = None
+            if bootstrap:
+                historical = executor.submit(self._calculate_historical_var, portfolio_returns, historical_rng, True)
+            
+            results = {
+                'historical': historical.result() if historical else self._calculate_historical_var(portfolio_returns),
+                'parametric': self._calculate_parametric_var(returns),
+                'monte_carlo': (monte_carlo.result() if monte_carlo
+                                else self._calculate_monte_carlo_var(returns, monte_carlo_rng)),
+                'volatility': self._calculate_volatility(portfolio_returns),
+                'sharpe_ratio': self._calculate_sharpe_ratio(portfolio_returns),
+                'max_drawdown': self._calculate_max_drawdown(portfolio_returns),
+                'var_breakdown': self._calculate_component_var(returns)
+            }
         
         return results
     
-    def _calculate_historical_var(self, returns: pd.Series) -> float:
-        """Historical simulation VaR with bootstrap enhancement"""
+    def _calculate_historical_var(self, returns: pd.Series, rng: Optional[np.random.Generator] = None,
+                                  bootstrap: bool = False) -> float:
+        """Historical simulation VaR, optionally smoothed with bootstrap resampling"""
+        
+        rng = self.rng if rng is None else rng
         
         # Scale returns to time horizon
-        scaled_returns = returns * np.sqrt(self.time_horizon)
+        scaled_returns = returns * self._sqrt_horizon
+        values = np.ascontiguousarray(scaled_returns, dtype=np.float64)
+        
+        # Resampling the empirical distribution converges to its own percentile,
+        # so the direct estimate is used unless bootstrap smoothing is requested
+        if not bootstrap:
+            return abs(np.percentile(values, self.alpha * 100) * self.portfolio.value)
         
-        # Bootstrap sampling for enhanced accuracy
-        bootstrap_samples = []
-        for _ in range(1000):
-            sample = np.random.choice(scaled_returns, size=len(scaled_returns), replace=True)
-            bootstrap_samples.extend(sample)
+        # Bootstrap sampling (all 1000 resamples drawn at once)
+        n = values.size
+        bootstrap_samples = values[rng.integers(0, n, size=1000 * n)]
         
         var_percentile = np.percentile(bootstrap_samples, self.alpha * 100)
         return abs(var_percentile * self.portfolio.value)
@@ -55,40 +153,68 @@ class RiskCalculator:
     def _calculate_parametric_var(self, returns: pd.DataFrame) -> float:
         """Enhanced parametric VaR with EWMA volatility"""
         
-        # Calculate EWMA covariance matrix
-        cov_matrix = self._calculate_ewma_covariance(returns)
+        # Calculate EWMA covariance matrix, reusing the running state only when it
+        # covers exactly this returns frame; otherwise reseed it from the input
+        returns_clean = returns.dropna()
+        end = returns_clean.index[-1] if len(returns_clean) else None
+        state = self._ewma_state
+        with self._ewma_lock:
+            source = state['source']() if state['source'] is not None else None
+            if (state['cov'] is None or source is not returns
+                    or not returns.columns.equals(state['columns'])
+                    or state['n_obs'] != len(returns_clean) or state['end'] != end):
+                state['cov'] = self._calculate_ewma_covariance(returns_clean, state['lambda'])
+                state['source'] = weakref.ref(returns)
+                state['columns'] = returns.columns
+                state['n_obs'] = len(returns_clean)
+                state['end'] = end
+            cov_matrix = state['cov']
         weights = self.portfolio.get_weights()
         
         # Portfolio variance and volatility
         portfolio_variance = np.dot(weights.T, np.dot(cov_matrix, weights))
-        portfolio_vol = np.sqrt(portfolio_variance * self.time_horizon)
+        portfolio_vol = np.sqrt(portfolio_variance) * self._sqrt_horizon
         
         # VaR calculation with normal distribution
-        z_score = stats.norm.ppf(self.alpha)
-        var_value = abs(z_score * portfolio_vol * self.portfolio.value)
+        var_value = abs(self._z * portfolio_vol * self.portfolio.value)
         
         return var_value
     
-    def _calculate_monte_carlo_var(self, returns: pd.DataFrame) -> float:
+    def _calculate_monte_carlo_var(self, returns: pd.DataFrame, rng: Optional[np.random.Generator] = None) -> float:
         """Advanced Monte Carlo simulation with multiple distributions"""
         
+        rng = self.rng if rng is None else rng
+        
         # Fit distributions to returns
         portfolio_returns = self.portfolio.get_portfolio_returns()
         
         # Use t-distribution for fat tails
         params = stats.t.fit(portfolio_returns)
         
-        # Generate scenarios
-        scenarios = []
-        for _ in range(self.simulations):
-            # Random scenario generation
-            random_returns = stats.t.rvs(*params, size=self.time_horizon)
-            scenario_return = np.sum(random_returns)
-            scenarios.append(scenario_return * self.portfolio.value)
+        # A single-period scenario is one fitted t draw, so its quantile is exact
+        if self.time_horizon == 1:
+            return abs(stats.t.ppf(self.alpha, *params) * self.portfolio.value)
+        
+        # Large runs use the compiled parallel kernel, seeded per chunk from rng
+        if self._uses_numba_monte_carlo():
+            n_chunks = -(-self.simulations // NUMBA_MC_CHUNK_SIZE)
+            seeds = rng.integers(0, 2**32, size=n_chunks)
+            df, loc, scale = params
+            with _NUMBA_PARALLEL_LOCK:
+                scenarios = _mc_pnl_nb(df, loc, scale, self.simulations, self.time_horizon,
+                                       float(self.portfolio.value), seeds)
+        else:
+            # Generate all scenarios in one draw, one row per simulation
+            draws = stats.t.rvs(*params, size=(self.simulations, self.time_horizon), random_state=rng)
+            scenarios = draws.sum(axis=1) * self.portfolio.value
         
         var_value = abs(np.percentile(scenarios, self.alpha * 100))
         return var_value
     
+    def _uses_numba_monte_carlo(self) -> bool:
+        """Whether Monte Carlo VaR runs on the parallel Numba kernel"""
+        return NUMBA_AVAILABLE and self.simulations * self.time_horizon >= NUMBA_MC_MIN_DRAWS
+    
     def _calculate_ewma_covariance(self, returns: pd.DataFrame, lambda_param: float = 0.94):
         """Calculate Exponentially Weighted Moving Average covariance matrix"""
         
@@ -100,15 +226,64 @@ class RiskCalculator:
         cov_matrix = returns_clean.cov().values * 252  # Annualize
         
         # EWMA calculation
-        for i in range(1, n_obs):
-            return_vec = returns_clean.iloc[i].values.reshape(-1, 1)
-            cov_matrix = lambda_param * cov_matrix + (1 - lambda_param) * np.dot(return_vec, return_vec.T)
+        if NUMBA_AVAILABLE:
+            R = np.ascontiguousarray(returns_clean.values.astype(np.float64, copy=False))
+            return _ewma_cov_nb(R, np.ascontiguousarray(cov_matrix, dtype=np.float64), lambda_param)
+        
+        # Unrolled recursion: observation i carries weight (1 - lambda) * lambda^(n_obs - 1 - i)
+        R = returns_clean.values[1:]
+        weights = (1 - lambda_param) * lambda_param ** np.arange(n_obs - 2, -1, -1)
+        Rw = R * np.sqrt(weights)[:, None]
+        cov_matrix = Rw.T @ Rw + lambda_param ** (n_obs - 1) * cov_matrix
+        
+        return cov_matrix
+    
+    def update_ewma(self, rows, returns: Optional[pd.DataFrame] = None) -> np.ndarray:
+        """Advance the running EWMA covariance by one or more new return observations
+        
+        Pass the extended returns frame (the previous frame plus rows) as returns to let
+        parametric VaR keep reusing the advanced state for that frame.
+        """
+        
+        with self._ewma_lock:
+            state = self._ewma_state
+            cov_matrix = state['cov']
+            if cov_matrix is None:
+                raise ValueError("EWMA state is not initialized; calculate parametric VaR first")
+            
+            # Convert once up front; the loop below only touches plain ndarray rows
+            R = np.asarray(rows, dtype=np.float64).reshape(-1, cov_matrix.shape[0])
+            n_obs = state['n_obs'] + R.shape[0]
+            
+            # Validate the extended frame before touching the state
+            end = None
+            if returns is not None:
+                returns_clean = returns.dropna()
+                if (not returns.columns.equals(state['columns']) or len(returns_clean) != n_obs
+                        or not np.array_equal(returns_clean.values[len(returns_clean) - R.shape[0]:], R)):
+                    raise ValueError("returns must be the previous EWMA returns extended by rows")
+                end = returns_clean.index[-1]
+            
+            # Update a private copy in place, reusing one buffer for the outer products
+            lambda_param = state['lambda']
+            cov_matrix = np.array(cov_matrix, dtype=np.float64, order='C')
+            scratch = np.empty_like(cov_matrix)
+            for return_vec in R:
+                np.outer(return_vec, return_vec, out=scratch)
+                scratch *= 1 - lambda_param
+                cov_matrix *= lambda_param
+                cov_matrix += scratch
+            
+            state['cov'] = cov_matrix
+            state['source'] = weakref.ref(returns) if returns is not None else None
+            state['n_obs'] = n_obs
+            state['end'] = end
         
         return cov_matrix
     
     def _calculate_volatility(self, returns: pd.Series) -> float:
         """Calculate portfolio volatility"""
-        return returns.std() * np.sqrt(252)
+        return returns.std() * SQRT_252
     
     def _calculate_sharpe_ratio(self, returns: pd.Series, risk_free_rate: float = 0.02) -> float:
         """Calculate Sharpe ratio"""
@@ -117,22 +292,35 @@ class RiskCalculator:
     
     def _calculate_max_drawdown(self, returns: pd.Series) -> float:
         """Calculate maximum drawdown"""
-        cumulative_returns = (1 + returns).cumprod()
-        rolling_max = cumulative_returns.expanding().max()
+        cumulative_returns = np.cumprod(1.0 + np.asarray(returns, dtype=np.float64))
+        rolling_max = np.maximum.accumulate(cumulative_returns)
         drawdown = (cumulative_returns - rolling_max) / rolling_max
         return abs(drawdown.min())
     
     def _calculate_component_var(self, returns: pd.DataFrame) -> Dict:
         """Calculate component VaR for each asset"""
         weights = self.portfolio.get_weights()
-        cov_matrix = returns.cov() * 252
+        cov_matrix = self._calculate_sample_covariance(returns) * 252
         
         portfolio_var = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights)))
         
         component_vars = {}
         for i, asset in enumerate(returns.columns):
-            marginal_var = np.dot(cov_matrix.iloc[i], weights) / portfolio_var
+            marginal_var = np.dot(cov_matrix[i], weights) / portfolio_var
             component_var = weights[i] * marginal_var
             component_vars[asset] = component_var * self.portfolio.value
         
         return component_vars
+    
+    def _calculate_sample_covariance(self, returns: pd.DataFrame) -> np.ndarray:
+        """Sample covariance via X.T @ X, without materializing a centered copy"""
+        X = returns.values
+        n = X.shape[0]
+        mu = X.mean(axis=0)
+        cov_matrix = (X.T @ X) / (n - 1) - (n / (n - 1)) * np.outer(mu, mu)
+        
+        # Fall back to pandas when the shortcut loses precision or data has gaps
+        if not np.all(np.isfinite(cov_matrix)) or np.any(np.diag(cov_matrix) < 0):
+            cov_matrix = returns.cov().values
+        
+        return cov_matrix
@@ -52,33 +52,43 @@ class DataHandler:
     def detect_outliers(data: pd.Series, method: str = "iqr", threshold: float = 3.0) -> pd.Series:
         """Detect outliers using various methods"""
         
+        values = np.asarray(data, dtype=np.float64)
+        
         if method == "iqr":
-            Q1 = data.quantile(0.25)
-            Q3 = data.quantile(0.75)
+            # Column-wise quartiles so DataFrames are handled per asset
+            Q1, Q3 = np.nanpercentile(values, [25, 75], axis=0)
             IQR = Q3 - Q1
             lower = Q1 - 1.5 * IQR
             upper = Q3 + 1.5 * IQR
-            return (data < lower) | (data > upper)
+            return DataHandler._wrap_like(data, (values < lower) | (values > upper))
         
         elif method == "zscore":
-            z_scores = np.abs((data - data.mean()) / data.std())
-            return z_scores > threshold
+            # Compare deviations against threshold * std rather than building z-scores
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0, ddof=1)
+            return DataHandler._wrap_like(data, np.abs(values - mean) > threshold * std)
         
         else:
             return pd.Series([False] * len(data), index=data.index)
     
+    @staticmethod
+    def _wrap_like(data, values: np.ndarray):
+        """Wrap an ndarray with the index (and columns or name) of data"""
+        
+        if isinstance(data, pd.DataFrame):
+            return pd.DataFrame(values, index=data.index, columns=data.columns)
+        return pd.Series(values, index=data.index, name=data.name)
+    
     @staticmethod
     def calculate_returns(prices: pd.DataFrame, method: str = "log") -> pd.DataFrame:
         """Calculate returns using different methods"""
         
-        if method == "log":
-            return np.log(prices / prices.shift(1))
-        
-        elif method == "simple":
+        if method == "simple":
             return prices.pct_change()
         
-        elif method == "continuous":
-            return np.log(prices / prices.shift(1))
+        # "log", "continuous" and unknown methods all use log returns
+        log_prices = np.log(prices.to_numpy(dtype=np.float64))
+        returns = np.full_like(log_prices, np.nan)
+        np.subtract(log_prices[1:], log_prices[:-1], out=returns[1:])
         
-        else:
-            return np.log(prices / prices.shift(1))
+        return DataHandler._wrap_like(prices, returns)
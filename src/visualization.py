@@ -7,12 +7,27 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+import weakref
 
 class RiskVisualizer:
     """Advanced visualization suite for risk analytics"""
     
     def __init__(self):
         self.color_palette = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
+        # Keyed on the portfolio object itself so entries die with their portfolio
+        self._cache = weakref.WeakKeyDictionary()
+    
+    def _get(self, portfolio, key: str, fn):
+        """Return a cached per-portfolio result, recomputing after a rebalance"""
+        
+        entry = self._cache.get(portfolio)
+        if entry is None or entry['version'] != portfolio.version:
+            entry = {'version': portfolio.version}
+            self._cache[portfolio] = entry
+        
+        if key not in entry:
+            entry[key] = fn()
+        return entry[key]
     
     def plot_var_distribution(self, results: dict) -> go.Figure:
         """Create VaR comparison chart"""
@@ -43,13 +58,8 @@ class RiskVisualizer:
     def plot_risk_decomposition(self, portfolio) -> go.Figure:
         """Create risk decomposition pie chart"""
         
-        returns = portfolio.get_returns()
-        weights = portfolio.get_weights()
-        
-        # Calculate individual asset volatilities
-        asset_vols = returns.std() * np.sqrt(252)
-        risk_contributions = weights * asset_vols
-        risk_contributions = risk_contributions / risk_contributions.sum()
+        risk_contributions = self._get(portfolio, 'risk_contributions',
+                                       lambda: self._calculate_risk_contributions(portfolio))
         
         fig = go.Figure(data=[
             go.Pie(
@@ -72,10 +82,10 @@ class RiskVisualizer:
         """Create time series analysis chart"""
         
         returns = portfolio.get_portfolio_returns()
-        cumulative_returns = (1 + returns).cumprod()
+        cumulative_returns = self._get(portfolio, 'cumulative_returns', lambda: (1 + returns).cumprod())
         
         # Calculate rolling volatility
-        rolling_vol = returns.rolling(window=30).std() * np.sqrt(252)
+        rolling_vol = self._get(portfolio, 'rolling_vol', lambda: returns.rolling(window=30).std() * np.sqrt(252))
         
         fig = make_subplots(
             rows=2, cols=1,
@@ -118,7 +128,7 @@ class RiskVisualizer:
     def plot_correlation_heatmap(self, portfolio) -> go.Figure:
         """Create correlation heatmap"""
         
-        corr_matrix = portfolio.get_correlation_matrix()
+        corr_matrix = self._get(portfolio, 'corr', portfolio.get_correlation_matrix)
         
         fig = go.Figure(data=go.Heatmap(
             z=corr_matrix.values,
@@ -138,3 +148,14 @@ class RiskVisualizer:
         )
         
         return fig
+    
+    def _calculate_risk_contributions(self, portfolio) -> np.ndarray:
+        """Calculate normalized volatility-weighted risk contributions"""
+        
+        returns = portfolio.get_returns_array()
+        weights = portfolio.get_weights()
+        
+        # Calculate individual asset volatilities
+        asset_vols = returns.std(axis=0, ddof=1) * np.sqrt(252)
+        risk_contributions = weights * asset_vols
+        return risk_contributions / risk_contributions.sum()